@@ -0,0 +1,496 @@
+"""Asyncio flavour of the main module, requires the optional httpx dependency (pip install download_station_api[async])."""
+import asyncio
+import time
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Union
+
+import httpx
+import orjson
+from loguru import logger
+
+from .download_station_api import (CONNECT_TIMEOUT, PROBLEM_ADDING_DOWNLOAD_LOG, REQUEST_TIMEOUT, RETRY_POLICY,
+                                   _DownloadStationBase, _backoff_delays, _join_ids, _CREATE_PARAMS,
+                                   _DELETE_PARAMS, _GET_INFO_PARAMS, _LIST_PARAMS, _LOGOUT_PARAMS,
+                                   _RESUME_PARAMS, _SEARCH_LIST_PARAMS, _SEARCH_START_PARAMS)
+
+
+# Enough connections for large gather() batches on HTTP/1.1, kept alive between polls
+CONNECTION_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=20, keepalive_expiry=60)
+
+
+async def _poll(predicate: Callable,
+                initial: float = 0.5,
+                factor: float = 1.5,
+                max_interval: float = 5.0,
+                deadline: Optional[float] = None,
+                immediate: bool = False,
+                jitter: bool = True):
+    """
+    Async counterpart of download_station_api._poll, predicate must be a zero argument coroutine function
+
+    :param predicate: Polling stops once the awaited result is truthy
+    :param initial: First sleep interval in seconds
+    :param factor: Multiplier applied to the interval after each unsuccessful poll
+    :param max_interval: Upper bound for the sleep interval in seconds
+    :param deadline: Optional time.monotonic() value after which polling gives up
+    :param immediate: Call predicate once before the first sleep
+    :param jitter: Sleep a random time between 0 and the interval, so concurrent pollers don't stay in lockstep
+    :return: Last value returned by predicate
+    """
+    if immediate:
+        result = await predicate()
+        if result:
+            return result
+    for delay in _backoff_delays(initial, factor, max_interval, jitter):
+        if deadline is not None:
+            delay = min(delay, max(deadline - time.monotonic(), 0))
+        await asyncio.sleep(delay)
+        result = await predicate()
+        if result or (deadline is not None and time.monotonic() >= deadline):
+            return result
+
+
+class AsyncDownloadStationAPI(_DownloadStationBase):
+    class_name = "AsyncDownloadStationAPI"
+
+    def __init__(self,
+                 user_name: str,
+                 password: str,
+                 nas_ip: str,
+                 api_port: str = "5000",
+                 api_endpoint: str = "webapi",
+                 sid_in_query: bool = False,
+                 cache_ttl: float = 2.0,
+                 https: bool = False,
+                 verify: Union[bool, str] = True):
+        """
+
+            Same arguments as DownloadStationAPI, use it as an async context manager so the session is closed:
+
+                async with AsyncDownloadStationAPI(...) as ds:
+                    await ds.get_download_info()
+
+            With https=True concurrent requests are multiplexed over a single HTTP/2 connection when the NAS offers it,
+            httpx only negotiates HTTP/2 over TLS so plain HTTP uses a pool of HTTP/1.1 connections.
+
+            :param user_name: Local Synology username
+            :param password: Local synology password
+            :param nas_ip: Synology IP address which hosts the download station instance
+            :param api_endpoint: Optional, defaults to webapi, should only be changed if a separate endpoint has been configured
+            :param api_port: Optional, defaults to 5000 (DSM serves HTTPS on 5001 by default)
+            :param sid_in_query: Optional, also send the SID as a _sid query param for NAS versions that ignore the cookie
+            :param cache_ttl: Optional, seconds task list/getinfo responses are reused for, 0 disables the cache
+            :param https: Optional, talk to the NAS over HTTPS instead of plain HTTP
+            :param verify: Optional, False or a CA bundle path for NAS certificates that are self-signed
+        """
+        super().__init__(user_name, password, nas_ip, api_port, api_endpoint, sid_in_query, cache_ttl, https)
+
+        # httpx only retries failed connection attempts, status based retries are left to the caller.
+        # HTTP/2 is only negotiated over TLS (httpx has no h2c support), plain HTTP uses pooled HTTP/1.1 connections
+        self._client = httpx.AsyncClient(transport=httpx.AsyncHTTPTransport(verify=verify,
+                                                                            http2=https,
+                                                                            retries=RETRY_POLICY.total,
+                                                                            limits=CONNECTION_LIMITS),
+                                         timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT))
+
+        # Created lazily so the lock belongs to the event loop the client is used from
+        self._auth_lock = None
+        # (api_endpoint, params, conditional) -> encoded body of reads currently on the wire, see _get_api_data
+        self._in_flight = {}
+
+    async def _login(self, expired_session_id: Optional[str] = None):
+        """
+        Logs in unless another task already replaced expired_session_id with a fresh SID
+
+        :param expired_session_id: SID the caller saw before deciding to log in
+        """
+        if self._auth_lock is None:
+            self._auth_lock = asyncio.Lock()
+        async with self._auth_lock:
+            if self.session_id == expired_session_id:
+                self.session_id = await self.authenticate(session='DownloadStation',
+                                                          auth_format='cookie',
+                                                          method='login',
+                                                          version=3)
+
+    async def _ensure_auth(self):
+        """
+        Logs in unless a session already exists, every call except the login itself goes through here first
+        """
+        if self.session_id is None:
+            await self._login()
+
+    async def _request(self, api_endpoint: str, params: Mapping, etag: Optional[str] = None) -> httpx.Response:
+        api_url = self._build_url(api_endpoint, params)
+        headers = {'If-None-Match': etag} if etag is not None else None
+        with self._breaker.guard(httpx.TransportError):
+            return await self._client.get(api_url, headers=headers)
+
+    async def _get_api_data(self, api_endpoint: str, params: Mapping, return_json: bool = True,
+                            conditional: bool = False, coalesce: bool = False):
+        """
+
+        With coalesce, identical requests issued while one is already in flight share its response instead of
+        hitting the NAS again, e.g. several tasks watching the same search. Only pass it for reads, every create,
+        resume or delete has to reach the NAS.
+
+        :param api_endpoint: self-explanatory
+        :param params: Request params be passed through to API
+        :param return_json: Specify whether to return json/dict or the entire httpx.Response
+        :param conditional: Send If-None-Match with the ETag of the last response, only for json reads
+        :param coalesce: Share an identical request that is already in flight, only for json reads
+        :return: API data in specified format
+        :rtype: Either dict or raw response, depending on last parameter
+        """
+        if not (coalesce and return_json):
+            return await self._fetch_api_data(api_endpoint, params, return_json, conditional)
+
+        # The shared task keeps the encoded body so every caller decodes its own copy, like the TTL cache does
+        async def fetch_encoded():
+            return orjson.dumps(await self._fetch_api_data(api_endpoint, params, conditional=conditional))
+
+        key = (api_endpoint, tuple(params.items()), conditional)
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fetch_encoded())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # Shielded so one caller being cancelled doesn't cancel the request for everyone sharing it
+        return orjson.loads(await asyncio.shield(task))
+
+    async def _fetch_api_data(self, api_endpoint: str, params: Mapping, return_json: bool = True,
+                              conditional: bool = False):
+        """
+
+        Logs in on first use and logs in again, retrying once, if the NAS reports the session has expired
+
+        :param api_endpoint: self-explanatory
+        :param params: Request params be passed through to API
+        :param return_json: Specify whether to return json/dict or the entire httpx.Response
+        :param conditional: Send If-None-Match with the ETag of the last response, only for json reads
+        :return: API data in specified format
+        :rtype: Either dict or raw response, depending on last parameter
+        """
+        if api_endpoint == 'API_Auth':
+            response = await self._request(api_endpoint, params)
+            return orjson.loads(response.content) if return_json else response
+
+        await self._ensure_auth()
+
+        key = (api_endpoint, tuple(params.items())) if conditional else None
+        session_id = self.session_id
+        stored = self._stored_response(key)
+        response = await self._request(api_endpoint, params, stored and stored[0])
+        data = self._read_response(response, key, stored)
+        if self._is_session_error(data):
+            logger.info('Session expired, logging in again')
+            await self._login(expired_session_id=session_id)
+            stored = self._stored_response(key)
+            response = await self._request(api_endpoint, params, stored and stored[0])
+            data = self._read_response(response, key, stored)
+
+        if return_json:
+            return data
+        else:
+            return response
+
+    async def _get_cached_api_data(self, api_endpoint: str, params: Mapping) -> Dict:
+        """
+
+        Same as _get_api_data, but successful responses are reused for cache_ttl seconds.
+        Only used for read-only task queries that callers tend to poll, any task change clears the cache.
+        Search and status polling loops deliberately bypass it so they see state changes straight away.
+
+        :param api_endpoint: self-explanatory
+        :param params: Request params be passed through to API
+        :return: API data
+        :rtype: dict
+        """
+        key = (api_endpoint, tuple(params.items()))
+        data = self._cache_get(key)
+        if data is None:
+            data = await self._get_api_data(api_endpoint, params, conditional=True, coalesce=True)
+            self._cache_put(key, data)
+        return data
+
+    async def __aenter__(self):
+        # Logging in here rather than in __init__ lets several clients be entered concurrently with asyncio.gather
+        await self._ensure_auth()
+        logger.info("{} entered successfully", self.class_name)
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        try:
+            if not self._should_logout(exc_type, exc_val):
+                return False
+
+            api_url = self._build_url('API_Auth', _LOGOUT_PARAMS)
+            # Only the status code matters here, so don't read the body
+            with self._breaker.guard(httpx.TransportError):
+                async with self._client.stream('GET', api_url) as response:
+                    self._log_logout(response.status_code)
+        finally:
+            self._reset_session_state()
+            self._client.cookies.clear()
+            await self._client.aclose()
+        return False
+
+    async def authenticate(self, session: str, auth_format: str, method: str, version: int) -> str:
+        """
+            See DownloadStationAPI.authenticate
+
+            :param session: Authentication session type.
+            :param auth_format: Authentication format
+            :param method: Authentication method
+            :param version: API version to address
+        """
+        data = await self._get_api_data("API_Auth", self._authentication_params(session, auth_format, method, version))
+        session_id = self._accept_session(data)
+        self._client.cookies.set('id', session_id, domain=self.nas_ip)
+        return session_id
+
+    async def search(self,
+                     search_term: str,
+                     wait_time: int = 30,
+                     quality_to_search: str = '720p') -> object:
+        """
+
+        See DownloadStationAPI.search
+
+        :param search_term: Thing to search for
+        :param wait_time: Maximum time to wait for the search to complete, partial results are returned after that.
+        :param quality_to_search: Video quality to search for.
+        """
+        return await self.bt_search_with_wait(search_term, default_search_quality=quality_to_search, max_wait=wait_time)
+
+    async def _get_search_results(self, search_task_id: str, quality_to_search: str):
+        """
+
+        :param search_task_id: Task ID returned when starting the search
+        :param quality_to_search: Video quality to filter the results by
+        :return: Tuple of whether the search has finished and the search data so far
+        """
+        search_params = dict(_SEARCH_LIST_PARAMS, filter_title=quality_to_search, taskid=search_task_id)
+
+        data = await self._get_api_data("DS_BT_Search", search_params, coalesce=True)
+        logger.debug("Response: {}", data)
+        return data["data"]["finished"], data["data"]
+
+    async def check_if_search_is_done(self,
+                                      search_task_id: str,
+                                      quality_to_search: str):
+        """
+
+        See DownloadStationAPI.check_if_search_is_done
+
+        :param search_task_id: Task ID returned when starting the search
+        :param quality_to_search: Video quality to filter the results by
+        :return: False while the search is running, the search data once it has finished
+        """
+        finished, data = await self._get_search_results(search_task_id, quality_to_search)
+        return data if finished else False
+
+    async def bt_search_with_wait(self,
+                                  search_term: str,
+                                  default_search_quality: str = "720p",
+                                  max_wait: Optional[float] = None):
+        """
+
+        See DownloadStationAPI.bt_search_with_wait
+
+        :param search_term:
+        :param default_search_quality:
+        :param max_wait: Optional maximum time to wait in seconds, partial results are returned after that
+        """
+
+        # Start search and get taskID
+        logger.info("Searching for {}", search_term)
+
+        search_params = dict(_SEARCH_START_PARAMS, keyword=search_term)
+        data = await self._get_api_data("DS_BT_Search", search_params)
+        logger.debug("Response: {}", data)
+
+        if not data.get('success'):
+            logger.error('Problem with search')
+            return None
+
+        search_task_id = data['data']['taskid']
+        last_poll = {}
+
+        async def search_is_done():
+            finished, last_poll['data'] = await self._get_search_results(search_task_id, default_search_quality)
+            if not finished:
+                logger.info("Search not complete, waiting")
+            return finished
+
+        # Check straight away as short searches may already be done, the last poll holds the results
+        deadline = time.monotonic() + max_wait if max_wait is not None else None
+        await _poll(search_is_done, deadline=deadline, immediate=True)
+        logger.info("Finished search for {}", search_term)
+
+        return last_poll['data']
+
+    async def get_individual_download_info(self, download_task_id: Union[str, Iterable[str]]) -> Dict:
+        """
+        :param download_task_id: Synology task ID, retrieved when getting the download info, or several IDs to
+            handle in a single request
+        """
+        logger.info('Getting individual info')
+
+        get_info_params = dict(_GET_INFO_PARAMS, id=_join_ids(download_task_id))
+
+        data = await self._get_api_data("DS_Task", get_info_params, coalesce=True)
+
+        if self._check_result(data, 'Download info retrieved', PROBLEM_ADDING_DOWNLOAD_LOG):
+            return data['data']
+
+    async def get_many_download_info(self, download_task_ids: Iterable[str]) -> List[Dict]:
+        """
+
+        Retrieves info for several download tasks in one request, getinfo accepts a comma separated list of IDs
+
+        :param download_task_ids: Synology task IDs, retrieved when getting the download info
+        :return: Task info for each ID, or False if the request failed
+        :rtype: List[Dict]
+        """
+        logger.info('Getting info for several downloads')
+
+        get_info_params = dict(_GET_INFO_PARAMS, id=_join_ids(download_task_ids))
+
+        data = await self._get_cached_api_data("DS_Task", get_info_params)
+
+        if self._check_result(data, 'Download info retrieved', PROBLEM_ADDING_DOWNLOAD_LOG):
+            return data['data']['tasks']
+        return False
+
+    async def get_download_info(self) -> Dict:
+        """
+
+        Retrieves a list of current downloads
+
+        :return: Dict containing a list of current downloads along with metadata
+        :rtype: Dict
+        """
+        logger.info('Getting current download info')
+        data = await self._get_cached_api_data("DS_Task", _LIST_PARAMS)
+
+        if self._check_result(data, 'Download info retrieved', PROBLEM_ADDING_DOWNLOAD_LOG):
+            return data['data']
+
+    async def add_download_task(self, url: str, destination: str = '') -> bool:
+        """
+            :param url: Magnet download URL
+            :param destination: Relative synology URL. If left blank will take the default of the synology download station
+            :return: True or false based on whether or the the download was successfully added
+            :rtype: bool
+        """
+        logger.info('Adding download task')
+
+        search_params = dict(_CREATE_PARAMS, uri=url, destination=destination)
+
+        data = await self._get_api_data("DS_Task", search_params)
+        self._clear_cache()
+
+        return self._check_result(data, 'Download task successfully added', PROBLEM_ADDING_DOWNLOAD_LOG)
+
+    async def resume_download_task(self, download_task_id: Union[str, Iterable[str]]) -> bool:
+        """
+        :param download_task_id: Synology task ID, retrieved when getting the download info, or several IDs to
+            handle in a single request
+        :return: True if resumed successfully
+        :rtype: bool
+        """
+        resume_params = dict(_RESUME_PARAMS, id=_join_ids(download_task_id))
+
+        data = await self._get_api_data("DS_Task", resume_params)
+        self._clear_cache()
+        return self._check_result(data, 'Download resumed', 'Problem resuming download task')
+
+    async def remove_download_task(self, download_task_id: Union[str, Iterable[str]]) -> bool:
+        """
+
+        :return: True if removed successfully
+        :rtype: bool
+        :param download_task_id: Synology task ID, retrieved when getting the download info, or several IDs to
+            handle in a single request
+        """
+        logger.info("Removing {}", download_task_id)
+        delete_params = dict(_DELETE_PARAMS, id=_join_ids(download_task_id))
+
+        data = await self._get_api_data("DS_Task", delete_params)
+        self._clear_cache()
+        return self._check_result(data, 'Download removed', 'Problem removing download')
+
+    async def add_many(self, urls: Iterable[str], destination: str = '') -> List[bool]:
+        """
+
+        Adds several download tasks concurrently
+
+        :param urls: Magnet download URLs
+        :param destination: Relative synology URL, applied to every task
+        :return: Result of add_download_task for each URL, in the same order as the URLs
+        :rtype: List[bool]
+        """
+        return list(await asyncio.gather(*(self.add_download_task(url, destination) for url in urls)))
+
+    async def resume_many(self, download_task_ids: Iterable[str]) -> List[bool]:
+        """
+
+        Resumes several download tasks concurrently
+
+        :param download_task_ids: Synology task IDs, retrieved when getting the download info
+        :return: Result of resume_download_task for each task, in the same order as the IDs
+        :rtype: List[bool]
+        """
+        return list(await asyncio.gather(*(self.resume_download_task(task_id) for task_id in download_task_ids)))
+
+    async def remove_many(self, download_task_ids: Iterable[str]) -> List[bool]:
+        """
+
+        Removes several download tasks concurrently
+
+        :param download_task_ids: Synology task IDs, retrieved when getting the download info
+        :return: Result of remove_download_task for each task, in the same order as the IDs
+        :rtype: List[bool]
+        """
+        return list(await asyncio.gather(*(self.remove_download_task(task_id) for task_id in download_task_ids)))
+
+    async def get_info_many(self, download_task_ids: Iterable[str]) -> List[Dict]:
+        """
+
+        Retrieves info for several download tasks concurrently
+
+        :param download_task_ids: Synology task IDs, retrieved when getting the download info
+        :return: Result of get_individual_download_info for each task, in the same order as the IDs
+        :rtype: List[Dict]
+        """
+        return list(await asyncio.gather(*(self.get_individual_download_info(task_id)
+                                           for task_id in download_task_ids)))
+
+    async def correct_finished_downloads(self, download_task_id: str, max_wait: float = 10) -> bool:
+        """
+
+        See DownloadStationAPI.correct_finished_downloads
+
+        :param download_task_id:
+        :param max_wait: Seconds to wait for the task to leave the finished state
+        :return: True if corrected successfully, False if the status never changed
+        :rtype: bool
+        """
+        old_status = 'finished'
+
+        # getinfo already reports the status, so resume once and only poll the status afterwards
+        async def status_changed():
+            info = await self.get_individual_download_info(download_task_id=download_task_id)
+            status = info['tasks'][0]['status']
+            logger.info(status)
+            return status if status != old_status else None
+
+        await self.resume_download_task(download_task_id=download_task_id)
+        # The NAS usually reacts to the resume almost immediately, so start checking after ~200ms
+        new_status = await _poll(status_changed, initial=0.2, deadline=time.monotonic() + max_wait)
+        self._log_corrected_status(download_task_id, new_status)
+        if new_status is None:
+            return False
+        if new_status == 'downloading':
+            await self.remove_download_task(download_task_id=download_task_id)
+        return True
@@ -1,12 +1,22 @@
 """Main module."""
+import random
+import threading
 import time
-from typing import Dict
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple, Union
+from urllib.parse import urlencode
 
 import requests
+import orjson
 from loguru import logger
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from .utils.auth_error import AuthError
-from .utils.api_endpoint_details import nas_api_endpoint_details
+from .utils.circuit_breaker import CircuitBreaker
+from .utils.api_endpoint_details import build_endpoints
 
 # Class written to interact with the Synology download station API
 # api docs stored here:
@@ -17,119 +27,506 @@ from .utils.api_endpoint_details import nas_api_endpoint_details
 PROBLEM_ADDING_DOWNLOAD_LOG = "Problem adding download task"
 ERROR_LOG = ""
 
+# Batch helpers fan out over the shared session, so the pool must hold at least as many connections as workers
+CONNECTION_POOL_SIZE = 10
+DEFAULT_MAX_WORKERS = 8
+
+# Seconds to wait on the NAS before giving up on a request, requests has no timeout by default.
+# Connecting is given much less time so an unreachable NAS is noticed (and trips the circuit breaker) quickly
+CONNECT_TIMEOUT = 3.0
+REQUEST_TIMEOUT = 30
+
+# Transient NAS failures (dropped connections, 5xx while a service restarts) are retried inside urllib3
+# on the same pooled connection, rather than surfacing mid-way through a polling loop
+RETRY_POLICY = Retry(total=3,
+                     backoff_factor=0.3,
+                     status_forcelist=[500, 502, 503, 504],
+                     allowed_methods=['GET'])
+
+# Every Synology call is a GET, so allowed_methods can't keep urllib3 from repeating a create or delete.
+# Calls that change state go through this policy instead, which only retries connections that never reached the NAS.
+# A 5xx still raises like an exhausted read retry would, it just isn't sent again
+WRITE_RETRY_POLICY = Retry(total=3,
+                           connect=3,
+                           read=0,
+                           status=0,
+                           other=0,
+                           backoff_factor=0.3,
+                           status_forcelist=[500, 502, 503, 504],
+                           allowed_methods=['GET'])
+
+# API methods that are safe to send twice, see RETRY_POLICY. A repeated login only costs a spare SID
+_RETRYABLE_METHODS = frozenset({'list', 'getinfo', 'login'})
+
+# Conditional reads keep the body of their last response around to answer a 304, so only remember the most recent few
+ETAG_CACHE_SIZE = 8
+
+# Synology error codes meaning the SID is missing, expired or no longer valid for this client
+SESSION_ERROR_CODES = {105, 106, 107, 119}
+
+# Fixed part of each request's params, read-only so they can be shared safely between calls and threads
+_LIST_PARAMS = MappingProxyType({'version': 1, 'method': 'list', 'additional': 'detail,file'})
+_GET_INFO_PARAMS = MappingProxyType({'version': 1, 'method': 'getinfo', 'additional': 'detail,file'})
+_CREATE_PARAMS = MappingProxyType({'version': 2, 'method': 'create'})
+_RESUME_PARAMS = MappingProxyType({'version': 1, 'method': 'resume'})
+_DELETE_PARAMS = MappingProxyType({'version': 1, 'method': 'delete'})
+_SEARCH_START_PARAMS = MappingProxyType({'version': 1, 'method': 'start', 'module': 'enabled'})
+_LOGOUT_PARAMS = MappingProxyType({'version': 1, 'method': 'logout', 'session': 'DownloadStation'})
+_SEARCH_LIST_PARAMS = MappingProxyType({'sort_by': 'seeds', 'sort_direction': 'desc', 'version': 1, 'method': 'list'})
+
+
+def _join_ids(download_task_id: Union[str, Iterable[str]]) -> str:
+    """
+    Task endpoints accept several IDs as one comma separated value
+    """
+    if isinstance(download_task_id, str):
+        return download_task_id
+    return ','.join(download_task_id)
+
+
+def _backoff_delays(initial: float, factor: float, max_interval: float, jitter: bool) -> Iterator[float]:
+    """
+    Endless sequence of sleep times for polling, the interval grows by factor up to max_interval.
+    With jitter each delay is drawn uniformly from [0, interval] ("full jitter").
+    """
+    interval = initial
+    while True:
+        yield random.uniform(0, interval) if jitter else interval
+        interval = min(interval * factor, max_interval)
+
+
+def _poll(predicate: Callable,
+          initial: float = 0.5,
+          factor: float = 1.5,
+          max_interval: float = 5.0,
+          deadline: Optional[float] = None,
+          immediate: bool = False,
+          jitter: bool = True):
+    """
+    Repeatedly sleeps then calls predicate until it returns something truthy,
+    growing the sleep interval exponentially up to max_interval
+
+    :param predicate: Zero argument callable, polling stops once it returns a truthy value
+    :param initial: First sleep interval in seconds
+    :param factor: Multiplier applied to the interval after each unsuccessful poll
+    :param max_interval: Upper bound for the sleep interval in seconds
+    :param deadline: Optional time.monotonic() value after which polling gives up
+    :param immediate: Call predicate once before the first sleep
+    :param jitter: Sleep a random time between 0 and the interval, so concurrent pollers don't stay in lockstep
+    :return: Last value returned by predicate
+    """
+    if immediate:
+        result = predicate()
+        if result:
+            return result
+    for delay in _backoff_delays(initial, factor, max_interval, jitter):
+        if deadline is not None:
+            delay = min(delay, max(deadline - time.monotonic(), 0))
+        time.sleep(delay)
+        result = predicate()
+        if result or (deadline is not None and time.monotonic() >= deadline):
+            return result
+
+
+class _DownloadStationBase:
+    """
+    State and request/response handling shared by DownloadStationAPI and the asyncio client.
+    Nothing in here does any I/O, so the two clients only differ in how they talk to the NAS.
+    """
+    class_name = "DownloadStationBase"
+
+    def __init__(self,
+                 user_name: str,
+                 password: str,
+                 nas_ip: str,
+                 api_port: str,
+                 api_endpoint: str,
+                 sid_in_query: bool,
+                 cache_ttl: float,
+                 https: bool):
+        logger.info("{} initialised", self.class_name)
+
+        self.user_name = user_name
+        self.password = password
+        self.nas_ip = nas_ip
+        self.api_endpoint = api_endpoint
+        self.api_port = api_port
+        self._sid_in_query = sid_in_query
+        self._scheme = 'https' if https else 'http'
+        self.nas_address = f"{self._scheme}://{self.nas_ip}:{api_port}/{api_endpoint}"
+        # Endpoint URLs never change for an instance, so build them once rather than on every call
+        self._endpoints = build_endpoints(self.nas_address)
+
+        # (api_endpoint, params) -> (expiry, encoded data) for read-only task queries, see _cache_put
+        self._cache = {}
+        self._cache_ttl = cache_ttl
+        self._cache_lock = threading.Lock()
+        # (api_endpoint, params) -> (ETag, raw body) of the last response, least recently used first, see _read_response
+        self._etags = OrderedDict()
+        self._etag_lock = threading.Lock()
+
+        # Stops hammering an unreachable NAS, see _request
+        self._breaker = CircuitBreaker(fail_max=5, reset_timeout=30)
+
+        # Login is deferred until the first API call, see _ensure_auth
+        self.session_id = None
+
+    def _build_url(self, api_endpoint: str, params: Mapping) -> str:
+        if self._sid_in_query and api_endpoint != 'API_Auth':
+            params = dict(params, _sid=self.session_id)
+        api_url, _ = self._endpoints[api_endpoint]
+        # Endpoint URLs already carry "?api=...", so append the encoded params rather than letting the client merge them
+        return api_url + '&' + urlencode(params)
+
+    def _authentication_params(self, session: str, auth_format: str, method: str, version: int) -> Dict:
+        return {
+            'session': session,
+            'format' : auth_format,
+            'method' : method,
+            'version': version,
+            'account': self.user_name,
+            'passwd' : self.password
+        }
+
+    def _stored_response(self, key: Optional[tuple]) -> Optional[Tuple[str, bytes]]:
+        """
+        :param key: (api_endpoint, params) of a conditional read, None for unconditional requests
+        :return: ETag and raw body of the last response for key, if there is one to send If-None-Match with
+        """
+        if key is None:
+            return None
+        with self._etag_lock:
+            stored = self._etags.get(key)
+            if stored is not None:
+                self._etags.move_to_end(key)
+        return stored
+
+    def _read_response(self, response, key: Optional[tuple] = None,
+                       stored: Optional[Tuple[str, bytes]] = None) -> Dict:
+        """
+        Decodes the response, answering a 304 Not Modified from the body kept for its ETag.
+        NAS builds that don't send ETags just never get a 304, so this falls back to a normal read.
+
+        :param response: requests or httpx response, both expose status_code, headers and content
+        :param key: (api_endpoint, params) to keep the ETag under, None for unconditional requests
+        :param stored: What _stored_response returned when the request was sent, it may have been evicted since
+        :return: API data
+        """
+        if response.status_code == 304:
+            if stored is None:
+                # Nothing to fall back on, e.g. a proxy answering with a validator this client never sent
+                logger.error("Got 304 Not Modified without a stored response for {}", key)
+                return {'success': False, 'error': {'code': 304}}
+            return orjson.loads(stored[1])
+        data = orjson.loads(response.content)
+        etag = response.headers.get('ETag')
+        if key is not None and etag and data.get('success'):
+            with self._etag_lock:
+                self._etags[key] = (etag, response.content)
+                self._etags.move_to_end(key)
+                while len(self._etags) > ETAG_CACHE_SIZE:
+                    self._etags.popitem(last=False)
+        return data
+
+    @staticmethod
+    def _is_session_error(data: Dict) -> bool:
+        return not data.get('success') and data.get('error', {}).get('code') in SESSION_ERROR_CODES
+
+    def _cache_get(self, key: tuple) -> Optional[Dict]:
+        """
+        :return: A fresh copy of the cached data, so callers are free to modify it, None if missing or expired
+        """
+        with self._cache_lock:
+            cached = self._cache.get(key)
+            if cached is None:
+                return None
+            if cached[0] <= time.monotonic():
+                del self._cache[key]
+                return None
+        return orjson.loads(cached[1])
+
+    def _cache_put(self, key: tuple, data: Dict):
+        if self._cache_ttl > 0 and data.get('success'):
+            # Kept encoded so every hit decodes its own copy, orjson round trips faster than copy.deepcopy
+            encoded = orjson.dumps(data)
+            with self._cache_lock:
+                now = time.monotonic()
+                # Pollers asking for ever changing task IDs never hit the same key twice, so sweep on every write
+                for expired in [k for k, (expiry, _) in self._cache.items() if expiry <= now]:
+                    del self._cache[expired]
+                self._cache[key] = (now + self._cache_ttl, encoded)
+
+    def _clear_cache(self):
+        with self._cache_lock:
+            self._cache.clear()
+
+    def _reset_session_state(self):
+        # The SID lives only in the cookie jar, so dropping it there and here is all it takes to forget the session
+        self.session_id = None
+        self._clear_cache()
+        with self._etag_lock:
+            self._etags.clear()
+
+    def _accept_session(self, data: Dict) -> str:
+        """
+        :param data: Response to a login request
+        :return: SID to send with subsequent requests
+        :raises AuthError: If the login was rejected
+        """
+        if data['success']:
+            logger.success("successfully authenticated")
+            # ETags were handed out to the old session, start the new one without any
+            with self._etag_lock:
+                self._etags.clear()
+            return data['data']['sid']
+        else:
+            logger.error(data)
+            raise AuthError('Authentication unsuccessful')
+
+    @staticmethod
+    def _check_result(data: Dict, success_message: str, error_message: str) -> bool:
+        if data['success'] is True:
+            logger.info(success_message)
+            return True
+        else:
+            logger.error(error_message)
+            logger.error(data)
+            return False
+
+    def _should_logout(self, exc_type, exc_val) -> bool:
+        """
+        Logs how the context manager was left and decides whether the API session needs closing
+        """
+        if exc_type is not None:
+            # The session is most likely unusable, so skip the logout and let the exception propagate
+            logger.error("Problem in {}", self.class_name)
+            logger.error(exc_type)
+            logger.error(exc_val)
+            return False
+        logger.info("{} exited successfully", self.class_name)
+        # Never logged in means there is no API session to close
+        return self.session_id is not None
+
+    @staticmethod
+    def _log_logout(status_code: int):
+        if status_code == 200:
+            logger.info('API session successfully closed')
+        else:
+            logger.error('Problem with closing API sessions')
+
+    @staticmethod
+    def _log_corrected_status(download_task_id: str, new_status: Optional[str]):
+        if new_status is None:
+            logger.error("Status of {} did not change after resuming", download_task_id)
+        if new_status == 'seeding':
+            logger.info('Successfully resumed')
+        if new_status == 'downloading':
+            logger.info('Incorrectly resumed')
+
+
+class DownloadStationAPI(_DownloadStationBase):
+    class_name = "DownloadStationAPI"
 
-class DownloadStationAPI:
     def __init__(self,
                  user_name: str,
                  password: str,
                  nas_ip: str,
                  api_port: str = "5000",
-                 api_endpoint: str = "webapi"):
+                 api_endpoint: str = "webapi",
+                 sid_in_query: bool = False,
+                 cache_ttl: float = 2.0,
+                 max_workers: int = DEFAULT_MAX_WORKERS,
+                 https: bool = False,
+                 verify: Union[bool, str] = True):
         """
 
             :param user_name: Local Synology username
             :param password: Local synology password
             :param nas_ip: Synology IP address which hosts the download station instance
             :param api_endpoint: Optional, defaults to webapi, should only be changed if a separate endpoint has been configured
-            :param api_port: Optional, defaults to 5000
+            :param api_port: Optional, defaults to 5000 (DSM serves HTTPS on 5001 by default)
+            :param sid_in_query: Optional, also send the SID as a _sid query param for NAS versions that ignore the cookie
+            :param cache_ttl: Optional, seconds task list/getinfo responses are reused for, 0 disables the cache
+            :param max_workers: Optional, number of threads the *_many batch helpers use
+            :param https: Optional, talk to the NAS over HTTPS instead of plain HTTP
+            :param verify: Optional, False or a CA bundle path for NAS certificates that are self-signed
+        """
+        super().__init__(user_name, password, nas_ip, api_port, api_endpoint, sid_in_query, cache_ttl, https)
+
+        # Pooled sessions so every call reuses a keep-alive connection to the NAS. Reads and writes hit the same URLs,
+        # so they get a session each to be mounted with a different retry policy, both share one cookie jar
+        self._session = requests.Session()
+        self._write_session = requests.Session()
+        self._write_session.cookies = self._session.cookies
+        for session, retry_policy in ((self._session, RETRY_POLICY), (self._write_session, WRITE_RETRY_POLICY)):
+            session.verify = verify
+            adapter = HTTPAdapter(pool_connections=1,
+                                  pool_maxsize=max(CONNECTION_POOL_SIZE, max_workers),
+                                  max_retries=retry_policy)
+            session.mount(f"{self._scheme}://{self.nas_ip}:{api_port}", adapter)
+
+        # Shared by the *_many helpers, created on first use and shut down in __exit__
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._max_workers = max_workers
+
+        # api_endpoint -> (prepared request, send settings), see _get_prepared_request
+        self._prepared = {}
+
+        self._auth_lock = threading.Lock()
+
+    def _login(self, expired_session_id: Optional[str] = None):
         """
-        self.class_name = type(self).__name__
-        logger.info(f"{self.class_name} initialised")
+        Logs in unless another thread already replaced expired_session_id with a fresh SID
 
-        self.user_name = user_name
-        self.password = password
-        self.nas_ip = nas_ip
-        self.api_endpoint = api_endpoint
-        self.api_port = api_port
-        self.nas_address = f"http://{self.nas_ip}:{api_port}/{api_endpoint}"
-        self.session_id = self.authenticate(session='DownloadStation',
-                                            auth_format='cookie',
-                                            method='login',
-                                            version=3)
+        :param expired_session_id: SID the caller saw before deciding to log in
+        """
+        with self._auth_lock:
+            if self.session_id == expired_session_id:
+                self.session_id = self.authenticate(session='DownloadStation',
+                                                    auth_format='cookie',
+                                                    method='login',
+                                                    version=3)
+
+    def _ensure_auth(self):
+        """
+        Logs in unless a session already exists, every call except the login itself goes through here first
+        """
+        if self.session_id is None:
+            self._login()
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        # Locked so concurrent *_many calls can't each create a pool and leak the one that gets overwritten
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self._max_workers)
+            return self._pool
 
-    def _get_api_data(self, api_endpoint: str, params: Dict, return_json: bool = True):
+    def _get_prepared_request(self, api_endpoint: str):
         """
+        Prepares a GET for the endpoint once, with the session's headers already merged in.
+        Cookies are left out, _request adds them from the jar on every send so a new SID or NAS cookie is always sent.
+
+        :param api_endpoint: self-explanatory
+        :return: Tuple of the prepared request and the send() settings requests would normally derive per call
+        """
+        template = self._prepared.get(api_endpoint)
+        if template is None:
+            api_url, _ = self._endpoints[api_endpoint]
+            prepared = self._session.prepare_request(requests.Request('GET', api_url))
+            prepared.headers.pop('Cookie', None)
+            settings = self._session.merge_environment_settings(prepared.url, {}, None, None, None)
+            template = self._prepared[api_endpoint] = (prepared, settings)
+        return template
+
+    def _request(self, api_endpoint: str, params: Mapping, etag: Optional[str] = None) -> requests.Response:
+        prepared, settings = self._get_prepared_request(api_endpoint)
+        request = prepared.copy()
+        request.url = self._build_url(api_endpoint, params)
+        request.prepare_cookies(self._session.cookies)
+        if etag is not None:
+            request.headers['If-None-Match'] = etag
+        session = self._session if params.get('method') in _RETRYABLE_METHODS else self._write_session
+        with self._breaker.guard(requests.RequestException):
+            return session.send(request, timeout=(CONNECT_TIMEOUT, REQUEST_TIMEOUT), **settings)
+
+    def _get_api_data(self, api_endpoint: str, params: Mapping, return_json: bool = True,
+                      conditional: bool = False):
+        """
+
+        Logs in on first use and logs in again, retrying once, if the NAS reports the session has expired
 
         :param api_endpoint: self-explanatory
         :param params: Request params be passed through to API
         :param return_json: Specify whether to return json/dict or the entire requests.response
+        :param conditional: Send If-None-Match with the ETag of the last response, only for json reads
         :return: API data in specified format
         :rtype: Either dict or raw response, depending on last parameter
         """
-
-        endpoint_info = nas_api_endpoint_details.get(api_endpoint)
-
-        api_endpoint = endpoint_info.get("api_endpoint")
-        api_path = endpoint_info.get("path")
-
-        api_url = f'{self.nas_address}/{api_path}?api={api_endpoint}'
-        response = requests.get(api_url, params=params)
+        if api_endpoint == 'API_Auth':
+            response = self._request(api_endpoint, params)
+            return orjson.loads(response.content) if return_json else response
+
+        self._ensure_auth()
+
+        key = (api_endpoint, tuple(params.items())) if conditional else None
+        session_id = self.session_id
+        stored = self._stored_response(key)
+        response = self._request(api_endpoint, params, stored and stored[0])
+        data = self._read_response(response, key, stored)
+        if self._is_session_error(data):
+            logger.info('Session expired, logging in again')
+            self._login(expired_session_id=session_id)
+            stored = self._stored_response(key)
+            response = self._request(api_endpoint, params, stored and stored[0])
+            data = self._read_response(response, key, stored)
 
         if return_json:
-            return response.json()
+            return data
         else:
             return response
 
-    def __enter__(self):
-        logger.info(f"{self.class_name} entered successfully")
+    def _get_cached_api_data(self, api_endpoint: str, params: Mapping) -> Dict:
+        """
 
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        if exc_type is not None:
-            logger.error(
-                'Problem in {class_name}'.format(class_name=self.class_name))
-            logger.error(exc_type)
-            logger.error(exc_val)
-            exit(1)
-        logger.info('{class_name} exited successfully'.format(
-            class_name=self.class_name))
-
-        # Step 4 - Logout of API session
-        logout_params = {
-            'version': 1,
-            'method' : 'logout',
-            'session': 'DownloadStation'
-        }
+        Same as _get_api_data, but successful responses are reused for cache_ttl seconds.
+        Only used for read-only task queries that callers tend to poll, any task change clears the cache.
+        Search and status polling loops deliberately bypass it so they see state changes straight away.
 
-        api_path = nas_api_endpoint_details['API_Auth']['path']
-        api_endpoint = nas_api_endpoint_details['API_Auth']['api_endpoint']
+        :param api_endpoint: self-explanatory
+        :param params: Request params be passed through to API
+        :return: API data
+        :rtype: dict
+        """
+        key = (api_endpoint, tuple(params.items()))
+        data = self._cache_get(key)
+        if data is None:
+            data = self._get_api_data(api_endpoint, params, conditional=True)
+            self._cache_put(key, data)
+        return data
 
-        api_url = f'{self.nas_address}/{api_path}?api={api_endpoint}'
-        response = requests.get(api_url, params=logout_params)
-        if response.status_code == 200:
-            logger.info('API session successfully closed')
-        else:
-            logger.error('Problem with closing API sessions')
+    def __enter__(self):
+        logger.info("{} entered successfully", self.class_name)
         return self
 
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            if not self._should_logout(exc_type, exc_val):
+                return False
+
+            # Step 4 - Logout of API session
+            api_url = self._build_url('API_Auth', _LOGOUT_PARAMS)
+            # Only the status code matters here, so don't download and buffer the body
+            with self._breaker.guard(requests.RequestException):
+                response = self._write_session.get(api_url, stream=True, timeout=(CONNECT_TIMEOUT, REQUEST_TIMEOUT))
+            response.close()
+            self._log_logout(response.status_code)
+        finally:
+            self._reset_session_state()
+            self._session.cookies.clear()
+            with self._pool_lock:
+                pool, self._pool = self._pool, None
+            if pool is not None:
+                pool.shutdown()
+            self._session.close()
+            self._write_session.close()
+        return False
+
     def authenticate(self, session: str, auth_format: str, method: str, version: int) -> str:
         """
-            See init for example usage
+            See _login for example usage
 
             :param session: Authentication session type.
             :param auth_format: Authentication format
             :param method: Authentication method
             :param version: API version to address
         """
-        authentication_params = {
-            'session': session,
-            'format' : auth_format,
-            'method' : method,
-            'version': version,
-            'account': self.user_name,
-            'passwd' : self.password
-        }
         # Authorization, returns SID
-        data = self._get_api_data("API_Auth", authentication_params)
-
-        if data['success']:
-            # If successfully authenticated use
-            # the SID in the subsequent requests
-            logger.success("successfully authenticated")
-            session_id = data['data']['sid']
-            return session_id
-        else:
-            logger.error(data)
-            raise AuthError('Authentication unsuccessful')
+        data = self._get_api_data("API_Auth", self._authentication_params(session, auth_format, method, version))
+        session_id = self._accept_session(data)
+        # Synology reads the SID from the "id" cookie, so it rides along on every request from here on
+        self._session.cookies.set('id', session_id, domain=self.nas_ip)
+        return session_id
 
     def search(self,
                search_term: str,
@@ -141,138 +538,113 @@ class DownloadStationAPI:
         * Essentially the same as typing in the search bar there
 
         :param search_term: Thing to search for
-        :param wait_time: Time to wait for the search to complete.
+        :param wait_time: Maximum time to wait for the search to complete, partial results are returned after that.
         :param quality_to_search: Video quality to search for.
         :return:
         :rtype:
         """
-        # Start search and get taskID
-
-        search_params = {
-            'version': 1,
-            'method' : 'start',
-            'keyword': search_term,
-            'module' : 'enabled',
-            '_sid'   : self.session_id
-        }
-        response = self._get_api_data("DS_BT_Search", search_params, return_json=False)
+        return self.bt_search_with_wait(search_term, default_search_quality=quality_to_search, max_wait=wait_time)
 
-        data = response.json()
-        search_task_id = data['data']['taskid']
+    def _get_search_results(self, search_task_id: str, quality_to_search: str):
+        """
 
-        if response.status_code == 200:
-            logger.info(f"Starting {wait_time} second search for {search_term}")
-            time.sleep(wait_time)
-
-            search_params = {
-                'sort_by'       : 'seeds',
-                'sort_direction': 'desc',
-                'version'       : 1,
-                'method'        : 'list',
-                'filter_title'  : quality_to_search,
-                'taskid'        : search_task_id,
-                '_sid'          : self.session_id
-            }
-            response = self._get_api_data("DS_BT_Search", search_params, return_json=False)
-            data = response.json()
-            logger.info(f"Finished search for {search_term}")
-            logger.debug(data)
+        :param search_task_id: Task ID returned when starting the search
+        :param quality_to_search: Video quality to filter the results by
+        :return: Tuple of whether the search has finished and the search data so far
+        """
+        search_params = dict(_SEARCH_LIST_PARAMS, filter_title=quality_to_search, taskid=search_task_id)
 
-            return data['data']
-        else:
-            logger.error('Problem with search')
-            return None
+        data = self._get_api_data("DS_BT_Search", search_params)
+        logger.debug("Response: {}", data)
+        return data["data"]["finished"], data["data"]
 
     def check_if_search_is_done(self,
                                 search_task_id: str,
                                 quality_to_search: str):
         """
 
-        :param search_task_id:
-        :param quality_to_search:
-        :type quality_to_search:
-        :return:
+        :param search_task_id: Task ID returned when starting the search
+        :param quality_to_search: Video quality to filter the results by
+        :return: False while the search is running, the search data once it has finished
         """
-        search_params = {
-            'sort_by'       : 'seeds',
-            'sort_direction': 'desc',
-            'version'       : 1,
-            'method'        : 'list',
-            'filter_title'  : quality_to_search,
-            'taskid'        : search_task_id,
-            '_sid'          : self.session_id
-        }
-
-        data = self._get_api_data("DS_BT_Search", search_params)
-        logger.debug(data)
-        if data["data"]["finished"] is False:
-            return data["data"]["finished"]
-        else:
-            return data["data"]
+        finished, data = self._get_search_results(search_task_id, quality_to_search)
+        return data if finished else False
 
     def bt_search_with_wait(self,
                             search_term: str,
-                            default_search_quality: str = "720p"):
+                            default_search_quality: str = "720p",
+                            max_wait: Optional[float] = None):
         """
 
-                :param search_term:
-                :param default_search_quality:
-                :return:
-                :rtype:
+        Starts a search and polls until it has finished
+
+        :param search_term: Thing to search for
+        :param default_search_quality: Video quality to search for
+        :param max_wait: Optional maximum time to wait in seconds, partial results are returned after that
+        :return: Search data, None if the search could not be started
         """
 
         # Start search and get taskID
-        logger.info(f"Searching for {search_term}")
-
-        search_params = {
-            'version': 1,
-            'method' : 'start',
-            'keyword': search_term,
-            'module' : 'enabled',
-            '_sid'   : self.session_id
-        }
+        logger.info("Searching for {}", search_term)
+
+        search_params = dict(_SEARCH_START_PARAMS, keyword=search_term)
         data = self._get_api_data("DS_BT_Search", search_params)
-        logger.debug(data)
+        logger.debug("Response: {}", data)
+
+        if not data.get('success'):
+            logger.error('Problem with search')
+            return None
 
         search_task_id = data['data']['taskid']
+        last_poll = {}
 
-        logger.info("Small wait")
-        time.sleep(2)
+        def search_is_done():
+            finished, last_poll['data'] = self._get_search_results(search_task_id, default_search_quality)
+            if not finished:
+                logger.info("Search not complete, waiting")
+            return finished
 
-        while self.check_if_search_is_done(search_task_id,
-                                           quality_to_search=default_search_quality) is False:
-            logger.info("Search not complete, waiting 5 seconds")
-            time.sleep(5)
+        # Check straight away as short searches may already be done, the last poll holds the results
+        deadline = time.monotonic() + max_wait if max_wait is not None else None
+        _poll(search_is_done, deadline=deadline, immediate=True)
+        logger.info("Finished search for {}", search_term)
 
-        # then Returns data using same function
-        return self.check_if_search_is_done(search_task_id,
-                                            quality_to_search=default_search_quality)
+        return last_poll['data']
 
-    def get_individual_download_info(self, download_task_id: str) -> Dict:
+    def get_individual_download_info(self, download_task_id: Union[str, Iterable[str]]) -> Dict:
         """
-        :param download_task_id:
+        :param download_task_id: Synology task ID, retrieved when getting the download info, or several IDs to
+            handle in a single request
         :return:
         :rtype:
         """
         logger.info('Getting individual info')
 
-        get_info_params = {
-            'version'   : 1,
-            'method'    : 'getinfo',
-            'additional': 'detail,file',
-            # ! Sid must always be last
-            'id'        : download_task_id,
-            '_sid'      : self.session_id
-        }
+        get_info_params = dict(_GET_INFO_PARAMS, id=_join_ids(download_task_id))
 
         data = self._get_api_data("DS_Task", get_info_params)
 
-        if data['success'] is True:
-            logger.info('Download info retrieved')
+        if self._check_result(data, 'Download info retrieved', PROBLEM_ADDING_DOWNLOAD_LOG):
             return data['data']
-        else:
-            logger.error(PROBLEM_ADDING_DOWNLOAD_LOG)
-            logger.error(data)
+
+    def get_many_download_info(self, download_task_ids: Iterable[str]) -> List[Dict]:
+        """
+
+        Retrieves info for several download tasks in one request, getinfo accepts a comma separated list of IDs
+
+        :param download_task_ids: Synology task IDs, retrieved when getting the download info
+        :return: Task info for each ID, or False if the request failed
+        :rtype: List[Dict]
+        """
+        logger.info('Getting info for several downloads')
+
+        get_info_params = dict(_GET_INFO_PARAMS, id=_join_ids(download_task_ids))
+
+        data = self._get_cached_api_data("DS_Task", get_info_params)
+
+        if self._check_result(data, 'Download info retrieved', PROBLEM_ADDING_DOWNLOAD_LOG):
+            return data['data']['tasks']
+        return False
 
     def get_download_info(self) -> Dict:
         """
@@ -283,21 +655,10 @@ class DownloadStationAPI:
         :rtype: Dict
         """
         logger.info('Getting current download info')
-        get_info_params = {
-            'version'   : 1,
-            'method'    : 'list',
-            'additional': 'detail,file',
-            # ! Sid must always be last
-            '_sid'      : self.session_id
-        }
-        data = self._get_api_data("DS_Task", get_info_params)
+        data = self._get_cached_api_data("DS_Task", _LIST_PARAMS)
 
-        if data['success'] is True:
-            logger.info('Download info retrieved')
+        if self._check_result(data, 'Download info retrieved', PROBLEM_ADDING_DOWNLOAD_LOG):
             return data['data']
-        else:
-            logger.error(PROBLEM_ADDING_DOWNLOAD_LOG)
-            logger.error(data)
 
     # Defaulting to series at the moment
     def add_download_task(self, url: str, destination: str = '') -> bool:
@@ -309,98 +670,116 @@ class DownloadStationAPI:
         """
         logger.info('Adding download task')
 
-        search_params = {
-            'version'    : 2,
-            'method'     : 'create',
-            'uri'        : url,
-            'destination': destination,
-            # ! Sid must always be last
-            '_sid'       : self.session_id
-        }
+        search_params = dict(_CREATE_PARAMS, uri=url, destination=destination)
 
         data = self._get_api_data("DS_Task", search_params)
+        self._clear_cache()
+        return self._check_result(data, 'Download task successfully added', PROBLEM_ADDING_DOWNLOAD_LOG)
 
-        if data['success'] is True:
-            logger.info('Download task successfully added')
-            return True
-        else:
-            logger.error(PROBLEM_ADDING_DOWNLOAD_LOG)
-            logger.error(data)
-            return False
-
-    def resume_download_task(self, download_task_id: object) -> bool:
+    def resume_download_task(self, download_task_id: Union[str, Iterable[str]]) -> bool:
         """
         :return:
         :rtype:
         :rtype: object
-        :param download_task_id: Synology task ID, retrieved when getting the download info
+        :param download_task_id: Synology task ID, retrieved when getting the download info, or several IDs to
+            handle in a single request
         :return:
         """
-        resume_params = {
-            'version': 1,
-            'method' : 'resume',
-            'id'     : download_task_id,
-            # ! Sid must always be last
-            '_sid'   : self.session_id
-        }
+        resume_params = dict(_RESUME_PARAMS, id=_join_ids(download_task_id))
 
         data = self._get_api_data("DS_Task", resume_params)
-        if data['success'] is True:
-            logger.info('Download resumed')
-            return True
-        else:
-            logger.error('Problem resuming download task')
-            logger.error(data)
-            return False
+        self._clear_cache()
+        return self._check_result(data, 'Download resumed', 'Problem resuming download task')
 
-    def remove_download_task(self, download_task_id: object) -> bool:
+    def remove_download_task(self, download_task_id: Union[str, Iterable[str]]) -> bool:
         """
 
         :return: True if removed successfully
         :rtype: bool
-        :param download_task_id: Synology task ID, retrieved when getting the download info
-        """
-        logger.info("Removing {}".format(download_task_id))
-        delete_params = {
-            'version': 1,
-            'method' : 'delete',
-            'id'     : download_task_id,
-            # ! Sid must always be last
-            '_sid'   : self.session_id
-        }
+        :param download_task_id: Synology task ID, retrieved when getting the download info, or several IDs to
+            handle in a single request
+        """
+        logger.info("Removing {}", download_task_id)
+        delete_params = dict(_DELETE_PARAMS, id=_join_ids(download_task_id))
 
         data = self._get_api_data("DS_Task", delete_params)
-        if data['success'] is True:
-            logger.info('Download removed')
-            return True
-        else:
-            logger.error('Problem removing download')
-            logger.error(data)
-            return False
+        self._clear_cache()
+        return self._check_result(data, 'Download removed', 'Problem removing download')
+
+    def add_many(self, urls: Iterable[str], destination: str = '') -> List[bool]:
+        """
+
+        Adds several download tasks concurrently, see resume_many
+
+        :param urls: Magnet download URLs
+        :param destination: Relative synology URL, applied to every task
+        :return: Result of add_download_task for each URL, in the same order as the URLs
+        :rtype: List[bool]
+        """
+        return list(self._get_pool().map(lambda url: self.add_download_task(url, destination), urls))
 
-    def correct_finished_downloads(self, download_task_id: str) -> bool:
+    def resume_many(self, download_task_ids: Iterable[str]) -> List[bool]:
+        """
+
+        Resumes several download tasks concurrently on the client's thread pool, see max_workers.
+        Each call is I/O bound and the GIL is released while waiting on the socket, so threads scale well here.
+
+        :param download_task_ids: Synology task IDs, retrieved when getting the download info
+        :return: Result of resume_download_task for each task, in the same order as the IDs
+        :rtype: List[bool]
+        """
+        return list(self._get_pool().map(self.resume_download_task, download_task_ids))
+
+    def remove_many(self, download_task_ids: Iterable[str]) -> List[bool]:
+        """
+
+        Removes several download tasks concurrently, see resume_many
+
+        :param download_task_ids: Synology task IDs, retrieved when getting the download info
+        :return: Result of remove_download_task for each task, in the same order as the IDs
+        :rtype: List[bool]
+        """
+        return list(self._get_pool().map(self.remove_download_task, download_task_ids))
+
+    def get_info_many(self, download_task_ids: Iterable[str]) -> List[Dict]:
+        """
+
+        Retrieves info for several download tasks concurrently, see resume_many
+
+        :param download_task_ids: Synology task IDs, retrieved when getting the download info
+        :return: Result of get_individual_download_info for each task, in the same order as the IDs
+        :rtype: List[Dict]
+        """
+        return list(self._get_pool().map(self.get_individual_download_info, download_task_ids))
+
+    def correct_finished_downloads(self, download_task_id: str, max_wait: float = 10) -> bool:
         """
 
         Simple function written for finished downloads, in the case that the download has already completed rather
         resume it so we can get more info or remove it if the file is no longer there
 
         :param download_task_id:
-        :return: True if corrected successfully
+        :param max_wait: Seconds to wait for the task to leave the finished state
+        :return: True if corrected successfully, False if the status never changed
         :rtype: bool
         """
         old_status = 'finished'
-        new_status = old_status
-        while new_status == old_status:
-            self.resume_download_task(download_task_id=download_task_id)
-            time.sleep(5)
-            new_status = self.get_individual_download_info(
+
+        # getinfo already reports the status, so resume once and only poll the status afterwards
+        def status_changed():
+            status = self.get_individual_download_info(
                 download_task_id=download_task_id)['tasks'][0]['status']
-            logger.info(new_status)
-            if new_status == 'seeding':
-                logger.info('Successfully resumed')
-            if new_status == 'downloading':
-                logger.info('Incorrectly resumed')
-                self.remove_download_task(download_task_id=download_task_id)
+            logger.info(status)
+            return status if status != old_status else None
+
+        self.resume_download_task(download_task_id=download_task_id)
+        # The NAS usually reacts to the resume almost immediately, so start checking after ~200ms
+        new_status = _poll(status_changed, initial=0.2, deadline=time.monotonic() + max_wait)
+        self._log_corrected_status(download_task_id, new_status)
+        if new_status is None:
+            return False
+        if new_status == 'downloading':
+            self.remove_download_task(download_task_id=download_task_id)
         return True
 
 if __name__ == '__main__':
@@ -2,3 +2,4 @@
 
 from . import api_endpoint_details
 from . import auth_error
+from . import circuit_breaker
@@ -1,17 +1,31 @@
-
+from types import MappingProxyType
+from typing import Dict, Tuple
 
 nas_api_endpoint_details = {
-    'API_Info'    : {'maxVersion'  : 1, 'minVersion': 1, 'path': 'query.cgi',
-                     'api_endpoint': 'SYNO.API.Info'},
-    'API_Auth'    : {'maxVersion'  : 7, 'minVersion': 1, 'path': 'auth.cgi',
-                     'api_endpoint': 'SYNO.API.Auth'},
-    'DS_Info'     : {'maxVersion'  : 2, 'minVersion': 1,
-                     'path'        : 'DownloadStation/info.cgi',
-                     'api_endpoint': 'SYNO.DownloadStation.Info'},
-    'DS_BT_Search': {'maxVersion'  : 1, 'minVersion': 1,
-                     'path'        : 'DownloadStation/btsearch.cgi',
-                     'api_endpoint': 'SYNO.DownloadStation.BTSearch'},
-    'DS_Task'     : {'maxVersion'  : 3, 'minVersion': 1,
-                     'path'        : 'DownloadStation/task.cgi',
-                     'api_endpoint': 'SYNO.DownloadStation.Task'}
+    'API_Info'    : MappingProxyType({'maxVersion'  : 1, 'minVersion': 1, 'path': 'query.cgi',
+                                      'api_endpoint': 'SYNO.API.Info'}),
+    'API_Auth'    : MappingProxyType({'maxVersion'  : 7, 'minVersion': 1, 'path': 'auth.cgi',
+                                      'api_endpoint': 'SYNO.API.Auth'}),
+    'DS_Info'     : MappingProxyType({'maxVersion'  : 2, 'minVersion': 1,
+                                      'path'        : 'DownloadStation/info.cgi',
+                                      'api_endpoint': 'SYNO.DownloadStation.Info'}),
+    'DS_BT_Search': MappingProxyType({'maxVersion'  : 1, 'minVersion': 1,
+                                      'path'        : 'DownloadStation/btsearch.cgi',
+                                      'api_endpoint': 'SYNO.DownloadStation.BTSearch'}),
+    'DS_Task'     : MappingProxyType({'maxVersion'  : 3, 'minVersion': 1,
+                                      'path'        : 'DownloadStation/task.cgi',
+                                      'api_endpoint': 'SYNO.DownloadStation.Task'})
 }
+
+
+def build_endpoints(nas_address: str) -> Dict[str, Tuple[str, str]]:
+    """
+    Resolves every endpoint against a NAS address once, so requests only need a single dict lookup
+
+    :param nas_address: Base address of the API, e.g. http://<ip>:5000/webapi
+    :return: Mapping of short endpoint name to (full URL including the api query param, Synology API name)
+    """
+    return {
+        name: (f"{nas_address}/{info['path']}?api={info['api_endpoint']}", info['api_endpoint'])
+        for name, info in nas_api_endpoint_details.items()
+    }
@@ -0,0 +1,59 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class CircuitOpenError(ConnectionError): pass
+
+
+class CircuitBreaker:
+    def __init__(self, fail_max: int = 5, reset_timeout: float = 30):
+        """
+            Fails fast while the NAS looks unreachable instead of waiting on a timeout for every call.
+
+            After fail_max consecutive failures the circuit opens and calls raise CircuitOpenError straight away.
+            Once reset_timeout seconds have passed calls are let through again, the first success closes the
+            circuit while another failure re-opens it for a further reset_timeout.
+
+            :param fail_max: Consecutive failures before the circuit opens
+            :param reset_timeout: Seconds to fail fast for before trying the NAS again
+        """
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """
+            :raises CircuitOpenError: If the circuit is open and the reset timeout hasn't passed yet
+        """
+        opened_at = self._opened_at
+        if opened_at is not None and time.monotonic() - opened_at < self.reset_timeout:
+            raise CircuitOpenError(f'NAS unreachable, failing fast for up to {self.reset_timeout} seconds')
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.fail_max:
+                self._opened_at = time.monotonic()
+
+    @contextmanager
+    def guard(self, *errors):
+        """
+        Wraps a single call to the NAS, failing fast while the circuit is open
+
+        :param errors: Exception types that count as the NAS being unreachable, anything else passes straight through
+        """
+        self.before_call()
+        try:
+            yield
+        except errors:
+            self.record_failure()
+            raise
+        self.record_success()
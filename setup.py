@@ -26,9 +26,15 @@ def get_requirements(test=False) -> List[str]:
 
 requirements = [
     "loguru==0.5.3",
-    "requests==2.25.1"
+    "orjson==3.5.3",
+    "requests==2.25.1",
+    "urllib3==1.26.6"
                 ]
 
+extra_requirements = {
+    "async": ["httpx[http2]==0.18.2"],
+}
+
 test_requirements = [
     "pip==19.2.3",
     "bump2version==0.5.11",
@@ -57,6 +63,7 @@ setup(
     ],
     description="Small python wrapper for interacting with the Synology Download Station",
     install_requires=requirements,
+    extras_require=extra_requirements,
     license="MIT license",
     long_description=readme + '\n\n' + history,
     include_package_data=True,
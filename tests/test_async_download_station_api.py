@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+
+"""Tests for `download_station_api.async_download_station_api`."""
+
+
+import asyncio
+import unittest
+from urllib.parse import parse_qs, urlparse
+
+from download_station_api import download_station_api
+from tests.test_download_station_api import FakeNAS, fake_response
+
+try:
+    import httpx
+    from download_station_api.async_download_station_api import AsyncDownloadStationAPI
+except ImportError:
+    httpx = None
+
+
+class AsyncFakeNAS(FakeNAS):
+    """FakeNAS answering httpx requests, pass handle to httpx.MockTransport. Queued exceptions are raised."""
+
+    def params(self, index=-1):
+        return {name: values[0] for name, values in parse_qs(urlparse(str(self.requests[index].url)).query).items()}
+
+    def handle(self, request):
+        response = self.send(request)
+        if isinstance(response, Exception):
+            raise response
+        return httpx.Response(response.status_code, headers=response.headers, content=response.content)
+
+
+@unittest.skipIf(httpx is None, 'requires the async extra')
+class TestAsyncDownloadStationAPI(unittest.TestCase):
+    """Tests for AsyncDownloadStationAPI against httpx.MockTransport."""
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+        self.nas = AsyncFakeNAS()
+        self.ds = AsyncDownloadStationAPI(user_name='user', password='password', nas_ip='127.0.0.1')
+        self.ds._client = httpx.AsyncClient(transport=httpx.MockTransport(self.nas.handle))
+        self.addCleanup(self.run_until_complete, self.ds._client.aclose())
+
+    def run_until_complete(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def test_login_is_deferred_until_first_call(self):
+        self.assertEqual(self.nas.methods(), [])
+        self.run_until_complete(self.ds.get_download_info())
+        self.assertEqual(self.nas.methods(), ['login', 'list'])
+        self.assertEqual(self.ds.session_id, 'sid1')
+
+    def test_entering_logs_in(self):
+        async def enter():
+            async with self.ds:
+                self.assertEqual(self.ds.session_id, 'sid1')
+
+        self.run_until_complete(enter())
+        self.assertEqual(self.nas.methods(), ['login', 'logout'])
+
+    def test_concurrent_calls_log_in_once(self):
+        self.nas.queue('getinfo', {'success': True, 'data': {'tasks': []}})
+        self.run_until_complete(self.ds.get_info_many(['dbid_1', 'dbid_2', 'dbid_3']))
+        self.assertEqual(self.nas.methods().count('login'), 1)
+
+    def test_logs_in_again_when_session_expires(self):
+        self.nas.queue('login', {'success': True, 'data': {'sid': 'sid1'}}, {'success': True, 'data': {'sid': 'sid2'}})
+        self.nas.queue('list', {'success': False, 'error': {'code': 119}}, {'success': True, 'data': {'total': 1}})
+        self.assertEqual(self.run_until_complete(self.ds.get_download_info()), {'total': 1})
+        self.assertEqual(self.nas.methods(), ['login', 'list', 'login', 'list'])
+        self.assertEqual(self.ds.session_id, 'sid2')
+        self.assertIn('id=sid2', self.nas.requests[-1].headers['Cookie'])
+
+    def test_only_retries_once_after_logging_in_again(self):
+        self.nas.queue('list', {'success': False, 'error': {'code': 119}})
+        self.assertIsNone(self.run_until_complete(self.ds.get_download_info()))
+        self.assertEqual(self.nas.methods(), ['login', 'list', 'login', 'list'])
+
+    def test_failed_login_raises(self):
+        self.nas.queue('login', {'success': False, 'error': {'code': 400}})
+        with self.assertRaises(download_station_api.AuthError):
+            self.run_until_complete(self.ds.get_download_info())
+
+    def test_task_list_is_cached(self):
+        self.run_until_complete(self.ds.get_download_info())
+        self.run_until_complete(self.ds.get_download_info())
+        self.assertEqual(self.nas.methods(), ['login', 'list'])
+
+    def test_writes_clear_the_cache(self):
+        for change in (lambda: self.ds.add_download_task('magnet:?xt=1'),
+                       lambda: self.ds.resume_download_task('dbid_1'),
+                       lambda: self.ds.remove_download_task('dbid_1')):
+            self.run_until_complete(self.ds.get_download_info())
+            self.run_until_complete(change())
+            self.run_until_complete(self.ds.get_download_info())
+        self.assertEqual(self.nas.methods(), ['login', 'list', 'create', 'list', 'resume', 'list', 'delete', 'list'])
+
+    def test_not_modified_answers_from_stored_response(self):
+        body = {'success': True, 'data': {'tasks': ['a'], 'total': 1}}
+        self.nas.queue('list', fake_response(body, headers={'ETag': '"v1"'}), fake_response(status_code=304))
+        self.ds._cache_ttl = 0
+        self.run_until_complete(self.ds.get_download_info())['tasks'].append('junk')
+        self.assertEqual(self.run_until_complete(self.ds.get_download_info()), body['data'])
+        self.assertEqual(self.nas.requests[-1].headers['If-None-Match'], '"v1"')
+
+    def test_unexpected_not_modified_does_not_raise(self):
+        self.nas.queue('list', fake_response(status_code=304))
+        self.assertIsNone(self.run_until_complete(self.ds.get_download_info()))
+
+    def test_add_many_sends_one_create_per_url(self):
+        urls = ['magnet:?xt=1', 'magnet:?xt=2', 'magnet:?xt=3']
+        self.assertEqual(self.run_until_complete(self.ds.add_many(urls)), [True, True, True])
+        self.assertEqual(self.nas.methods().count('create'), 3)
+        self.assertEqual(sorted(self.nas.params(index)['uri'] for index in range(1, 4)), urls)
+
+    def test_resume_and_remove_many_send_one_request_per_task(self):
+        self.assertEqual(self.run_until_complete(self.ds.resume_many(['dbid_1', 'dbid_2'])), [True, True])
+        self.assertEqual(self.run_until_complete(self.ds.remove_many(['dbid_1', 'dbid_2'])), [True, True])
+        self.assertEqual(self.nas.methods(), ['login', 'resume', 'resume', 'delete', 'delete'])
+        self.assertEqual([self.nas.params(index)['id'] for index in range(1, 5)],
+                         ['dbid_1', 'dbid_2', 'dbid_1', 'dbid_2'])
+
+    def test_batch_helpers_report_each_failure(self):
+        self.nas.queue('resume', {'success': False, 'error': {'code': 544}})
+        self.nas.queue('getinfo', {'success': False, 'error': {'code': 544}})
+        self.assertEqual(self.run_until_complete(self.ds.resume_many(['dbid_1', 'dbid_2'])), [False, False])
+        self.assertEqual(self.run_until_complete(self.ds.get_info_many(['dbid_1', 'dbid_2'])), [None, None])
+
+    def test_get_many_download_info_sends_one_request(self):
+        tasks = [{'id': 'dbid_1'}, {'id': 'dbid_2'}]
+        self.nas.queue('getinfo', {'success': True, 'data': {'tasks': tasks}})
+        self.assertEqual(self.run_until_complete(self.ds.get_many_download_info(['dbid_1', 'dbid_2'])), tasks)
+        self.assertEqual(self.nas.methods(), ['login', 'getinfo'])
+        self.assertEqual(self.nas.params()['id'], 'dbid_1,dbid_2')
+
+    def test_exit_logs_out_through_the_circuit_breaker(self):
+        self.nas.queue('logout', httpx.ConnectError('NAS unreachable'))
+
+        async def enter():
+            async with self.ds:
+                pass
+
+        with self.assertRaises(httpx.ConnectError):
+            self.run_until_complete(enter())
+        self.assertEqual(self.ds._breaker._failures, 1)
+        self.assertIsNone(self.ds.session_id)
+        self.assertTrue(self.ds._client.is_closed)
+
+    def test_identical_concurrent_reads_share_one_request(self):
+        self.nas.queue('getinfo', {'success': True, 'data': {'tasks': [{'id': 'dbid_1'}]}})
+
+        async def read_concurrently():
+            return await asyncio.gather(*(self.ds.get_individual_download_info('dbid_1') for _ in range(5)))
+
+        results = self.run_until_complete(read_concurrently())
+        self.assertEqual(self.nas.methods(), ['login', 'getinfo'])
+        self.assertEqual(results, [{'tasks': [{'id': 'dbid_1'}]}] * 5)
+        # Every caller gets its own copy
+        results[0]['tasks'].append('junk')
+        self.assertEqual(len({id(result) for result in results}), 5)
+        self.assertEqual(results[1]['tasks'], [{'id': 'dbid_1'}])
+
+    def test_identical_concurrent_writes_are_not_merged(self):
+        async def add_concurrently():
+            return await asyncio.gather(*(self.ds.add_download_task('magnet:?xt=1') for _ in range(3)))
+
+        self.assertEqual(self.run_until_complete(add_concurrently()), [True, True, True])
+        self.assertEqual(self.nas.methods(), ['login', 'create', 'create', 'create'])
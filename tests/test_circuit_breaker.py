@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+
+"""Tests for `download_station_api.utils.circuit_breaker`."""
+
+
+import unittest
+from unittest import mock
+
+from download_station_api.utils import circuit_breaker
+from download_station_api.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Tests for the CircuitBreaker state machine."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.clock = FakeClock()
+        patcher = mock.patch.object(circuit_breaker, 'time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker(fail_max=3, reset_timeout=30)
+
+    def record_failures(self, times=1):
+        for _ in range(times):
+            with self.assertRaises(ConnectionError):
+                with self.breaker.guard(ConnectionError):
+                    raise ConnectionError('NAS unreachable')
+
+    def test_stays_closed_below_fail_max(self):
+        self.record_failures(2)
+        self.breaker.before_call()
+
+    def test_opens_after_fail_max(self):
+        self.record_failures(3)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_call()
+
+    def test_fails_fast_during_cooldown(self):
+        self.record_failures(3)
+        self.clock.now += 29
+        called = []
+        with self.assertRaises(CircuitOpenError):
+            with self.breaker.guard(ConnectionError):
+                called.append(True)
+        self.assertEqual(called, [])
+
+    def test_success_resets_failure_count(self):
+        self.record_failures(2)
+        with self.breaker.guard(ConnectionError):
+            pass
+        self.record_failures(2)
+        self.breaker.before_call()
+
+    def test_closes_on_success_after_cooldown(self):
+        self.record_failures(3)
+        self.clock.now += 30
+        with self.breaker.guard(ConnectionError):
+            pass
+        self.record_failures(2)
+        self.breaker.before_call()
+
+    def test_reopens_on_failure_after_cooldown(self):
+        self.record_failures(3)
+        self.clock.now += 30
+        self.record_failures(1)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_call()
+
+    def test_other_errors_are_not_counted(self):
+        for _ in range(3):
+            with self.assertRaises(ValueError):
+                with self.breaker.guard(ConnectionError):
+                    raise ValueError('bad payload')
+        self.breaker.before_call()
+
+    def test_open_error_is_a_connection_error(self):
+        self.assertTrue(issubclass(CircuitOpenError, ConnectionError))
@@ -3,9 +3,67 @@
 """Tests for `download_station_api` package."""
 
 
+import sys
+import threading
 import unittest
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+import orjson
+import requests
 
 from download_station_api import download_station_api
+from download_station_api.download_station_api import DownloadStationAPI, _backoff_delays, _join_ids, _poll
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def fake_response(payload=None, status_code=200, headers=None):
+    return mock.Mock(status_code=status_code,
+                     headers=headers or {},
+                     content=orjson.dumps(payload) if payload is not None else b'')
+
+
+class FakeNAS:
+    """Stands in for Session.send, answering each API method with the next queued response"""
+
+    def __init__(self):
+        self.requests = []
+        self.responses = {
+            'login': [{'success': True, 'data': {'sid': 'sid1'}}],
+            'list': [{'success': True, 'data': {'tasks': [], 'total': 0}}],
+        }
+
+    def queue(self, method, *responses):
+        """
+        Answers method with each response in turn, the last one is repeated from then on
+        """
+        self.responses[method] = list(responses)
+
+    def params(self, index=-1):
+        return {name: values[0] for name, values in parse_qs(urlparse(self.requests[index].url).query).items()}
+
+    def methods(self):
+        return [self.params(index)['method'] for index in range(len(self.requests))]
+
+    def send(self, request, **kwargs):
+        self.requests.append(request)
+        queued = self.responses.get(self.params()['method'], [{'success': True}])
+        response = queued.pop(0) if len(queued) > 1 else queued[0]
+        if isinstance(response, dict):
+            response = fake_response(response)
+        return response
 
 
 class TestDownload_station_api(unittest.TestCase):
@@ -19,3 +77,310 @@ class TestDownload_station_api(unittest.TestCase):
 
     def test_000_something(self):
         """Test something."""
+
+
+class TestLogout(unittest.TestCase):
+    """Tests for leaving the DownloadStationAPI context manager."""
+
+    def test_exit_logs_out_through_the_circuit_breaker(self):
+        ds = DownloadStationAPI(user_name='user', password='password', nas_ip='127.0.0.1')
+        ds.session_id = 'sid1'
+        ds._write_session.get = mock.Mock(side_effect=requests.ConnectionError('NAS unreachable'))
+        with self.assertRaises(requests.ConnectionError):
+            with ds:
+                pass
+        self.assertEqual(ds._breaker._failures, 1)
+        self.assertIsNone(ds.session_id)
+
+
+class TestJoinIds(unittest.TestCase):
+    """Tests for _join_ids."""
+
+    def test_passes_strings_through(self):
+        self.assertEqual(_join_ids('dbid_1'), 'dbid_1')
+
+    def test_joins_iterables(self):
+        self.assertEqual(_join_ids(['dbid_1', 'dbid_2']), 'dbid_1,dbid_2')
+        self.assertEqual(_join_ids(task_id for task_id in ('dbid_3',)), 'dbid_3')
+
+
+class TestPoll(unittest.TestCase):
+    """Tests for _poll and _backoff_delays."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(download_station_api, 'time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_backoff_delays_grow_up_to_max_interval(self):
+        delays = _backoff_delays(0.5, 2, 3, jitter=False)
+        self.assertEqual([next(delays) for _ in range(5)], [0.5, 1, 2, 3, 3])
+
+    def test_backoff_delays_jitter_stays_within_interval(self):
+        delays = _backoff_delays(1, 2, 4, jitter=True)
+        for interval in (1, 2, 4, 4):
+            self.assertTrue(0 <= next(delays) <= interval)
+
+    def test_immediate_checks_before_sleeping(self):
+        self.assertEqual(_poll(lambda: 'done', immediate=True), 'done')
+        self.assertEqual(self.clock.sleeps, [])
+
+    def test_immediate_falls_back_to_polling(self):
+        results = iter([None, 'done'])
+        self.assertEqual(_poll(lambda: next(results), immediate=True, jitter=False), 'done')
+        self.assertEqual(self.clock.sleeps, [0.5])
+
+    def test_sleeps_before_first_check_by_default(self):
+        self.assertEqual(_poll(lambda: 'done', jitter=False), 'done')
+        self.assertEqual(self.clock.sleeps, [0.5])
+
+    def test_polls_until_truthy(self):
+        results = iter([None, None, 'done'])
+        self.assertEqual(_poll(lambda: next(results), initial=1, factor=2, jitter=False), 'done')
+        self.assertEqual(self.clock.sleeps, [1, 2, 4])
+
+    def test_gives_up_at_deadline(self):
+        calls = []
+
+        def never_done():
+            calls.append(self.clock.now)
+            return None
+
+        self.assertIsNone(_poll(never_done, initial=1, factor=2, deadline=5, jitter=False))
+        # Sleeps are clamped so the last check happens right at the deadline rather than after it
+        self.assertEqual(self.clock.sleeps, [1, 2, 2])
+        self.assertEqual(calls[-1], 5)
+
+
+class TestDownloadStationAPI(unittest.TestCase):
+    """Tests for DownloadStationAPI against a mocked session."""
+
+    def setUp(self):
+        self.nas = FakeNAS()
+        self.ds = DownloadStationAPI(user_name='user', password='password', nas_ip='127.0.0.1')
+        self.ds._session.send = mock.Mock(side_effect=self.nas.send)
+        self.ds._write_session.send = mock.Mock(side_effect=self.nas.send)
+
+    def fake_clock(self):
+        clock = FakeClock()
+        patcher = mock.patch.object(download_station_api, 'time', clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return clock
+
+    def test_login_is_deferred_until_first_call(self):
+        self.assertEqual(self.nas.methods(), [])
+        self.ds.get_download_info()
+        self.assertEqual(self.nas.methods(), ['login', 'list'])
+        self.assertEqual(self.ds.session_id, 'sid1')
+
+    def test_logs_in_again_when_session_expires(self):
+        self.nas.queue('login', {'success': True, 'data': {'sid': 'sid1'}}, {'success': True, 'data': {'sid': 'sid2'}})
+        self.nas.queue('list', {'success': False, 'error': {'code': 119}}, {'success': True, 'data': {'total': 1}})
+        self.assertEqual(self.ds.get_download_info(), {'total': 1})
+        self.assertEqual(self.nas.methods(), ['login', 'list', 'login', 'list'])
+        self.assertEqual(self.ds.session_id, 'sid2')
+        self.assertIn('id=sid2', self.nas.requests[-1].headers['Cookie'])
+
+    def test_only_retries_once_after_logging_in_again(self):
+        self.nas.queue('list', {'success': False, 'error': {'code': 119}})
+        self.assertIsNone(self.ds.get_download_info())
+        self.assertEqual(self.nas.methods(), ['login', 'list', 'login', 'list'])
+
+    def test_failed_login_raises(self):
+        self.nas.queue('login', {'success': False, 'error': {'code': 400}})
+        with self.assertRaises(download_station_api.AuthError):
+            self.ds.get_download_info()
+
+    def test_only_reads_use_the_session_with_status_retries(self):
+        self.ds.get_download_info()
+        self.ds.add_download_task('magnet:?xt=1')
+        self.ds.resume_download_task('dbid_1')
+        self.ds.remove_download_task('dbid_1')
+        read_methods = [parse_qs(urlparse(call[0][0].url).query)['method'][0]
+                        for call in self.ds._session.send.call_args_list]
+        write_methods = [parse_qs(urlparse(call[0][0].url).query)['method'][0]
+                         for call in self.ds._write_session.send.call_args_list]
+        self.assertEqual(read_methods, ['login', 'list'])
+        self.assertEqual(write_methods, ['create', 'resume', 'delete'])
+
+    def test_write_retry_policy_never_resends(self):
+        retry_policy = self.ds._write_session.get_adapter(self.ds.nas_address).max_retries
+        self.assertEqual((retry_policy.read, retry_policy.status, retry_policy.other), (0, 0, 0))
+        self.assertEqual(retry_policy.connect, 3)
+
+    def test_get_many_download_info_sends_one_request(self):
+        tasks = [{'id': 'dbid_1'}, {'id': 'dbid_2'}]
+        self.nas.queue('getinfo', {'success': True, 'data': {'tasks': tasks}})
+        self.assertEqual(self.ds.get_many_download_info(['dbid_1', 'dbid_2']), tasks)
+        self.assertEqual(self.nas.methods(), ['login', 'getinfo'])
+        self.assertEqual(self.nas.params()['id'], 'dbid_1,dbid_2')
+
+    def test_get_many_download_info_returns_false_on_failure(self):
+        self.nas.queue('getinfo', {'success': False, 'error': {'code': 544}})
+        self.assertIs(self.ds.get_many_download_info(['dbid_1', 'dbid_2']), False)
+
+    def test_several_ids_are_resumed_and_removed_in_one_request(self):
+        self.assertTrue(self.ds.resume_download_task(['dbid_1', 'dbid_2']))
+        self.assertEqual(self.nas.params()['id'], 'dbid_1,dbid_2')
+        self.assertTrue(self.ds.remove_download_task(('dbid_3', 'dbid_4')))
+        self.assertEqual(self.nas.params()['id'], 'dbid_3,dbid_4')
+        self.assertEqual(self.nas.methods(), ['login', 'resume', 'delete'])
+
+    def test_failed_batch_resume_and_remove_return_false(self):
+        self.nas.queue('resume', {'success': False, 'error': {'code': 544}})
+        self.nas.queue('delete', {'success': False, 'error': {'code': 544}})
+        self.assertIs(self.ds.resume_download_task(['dbid_1', 'dbid_2']), False)
+        self.assertIs(self.ds.remove_download_task(['dbid_1', 'dbid_2']), False)
+
+    def test_task_list_is_cached(self):
+        self.ds.get_download_info()
+        self.ds.get_download_info()
+        self.assertEqual(self.nas.methods(), ['login', 'list'])
+
+    def test_writes_clear_the_cache(self):
+        for change in (lambda: self.ds.add_download_task('magnet:?xt=1'),
+                       lambda: self.ds.resume_download_task('dbid_1'),
+                       lambda: self.ds.remove_download_task('dbid_1')):
+            self.ds.get_download_info()
+            change()
+            self.ds.get_download_info()
+        self.assertEqual(self.nas.methods(), ['login', 'list', 'create', 'list', 'resume', 'list', 'delete', 'list'])
+
+    def test_cached_results_are_copies(self):
+        self.ds.get_download_info()['tasks'].append('junk')
+        self.assertEqual(self.ds.get_download_info()['tasks'], [])
+
+    def test_expired_cache_entries_are_dropped(self):
+        self.nas.queue('getinfo', {'success': True, 'data': {'tasks': []}})
+        clock = FakeClock()
+        with mock.patch.object(download_station_api, 'time', clock):
+            for task_id in range(10):
+                self.ds.get_many_download_info([str(task_id)])
+                clock.now += 5
+        self.assertEqual(len(self.ds._cache), 1)
+
+    def test_cache_is_cleared_on_exit(self):
+        self.ds.get_download_info()
+        with self.ds:
+            pass
+        self.assertEqual(self.ds._cache, {})
+
+    def test_cache_survives_concurrent_writes_and_clears(self):
+        errors = []
+        done = threading.Event()
+        data = {'success': True, 'data': {'tasks': []}}
+
+        def put(thread_id):
+            try:
+                for index in range(3000):
+                    self.ds._cache_put(('DS_Task', thread_id, index), data)
+                    self.ds._cache_get(('DS_Task', thread_id, index))
+            except Exception as error:
+                errors.append(error)
+
+        def clear():
+            try:
+                while not done.is_set():
+                    self.ds._clear_cache()
+            except Exception as error:
+                errors.append(error)
+
+        # Switch threads as often as possible so the sweep in _cache_put overlaps the other threads
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        self.addCleanup(sys.setswitchinterval, switch_interval)
+        writers = [threading.Thread(target=put, args=(thread_id,)) for thread_id in range(3)]
+        clearer = threading.Thread(target=clear)
+        for thread in writers + [clearer]:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        done.set()
+        clearer.join()
+        self.assertEqual(errors, [])
+
+    def test_not_modified_answers_from_stored_response(self):
+        body = {'success': True, 'data': {'tasks': ['a'], 'total': 1}}
+        self.nas.queue('list', fake_response(body, headers={'ETag': '"v1"'}), fake_response(status_code=304))
+        self.ds._cache_ttl = 0
+        self.ds.get_download_info()['tasks'].append('junk')
+        self.assertEqual(self.ds.get_download_info(), body['data'])
+        self.assertEqual(self.nas.requests[-1].headers['If-None-Match'], '"v1"')
+
+    def test_unexpected_not_modified_does_not_raise(self):
+        self.nas.queue('list', fake_response(status_code=304))
+        self.assertIsNone(self.ds.get_download_info())
+
+    def test_stored_responses_are_bounded(self):
+        self.nas.queue('getinfo', fake_response({'success': True, 'data': {'tasks': []}}, headers={'ETag': '"v1"'}))
+        for task_id in range(download_station_api.ETAG_CACHE_SIZE + 2):
+            self.ds.get_many_download_info([str(task_id)])
+        self.assertEqual(len(self.ds._etags), download_station_api.ETAG_CACHE_SIZE)
+        # The least recently used responses are dropped first
+        self.assertNotIn(('id', '0'), [param for key in self.ds._etags for param in key[1]])
+
+    def test_logging_in_again_forgets_stored_responses(self):
+        body = {'success': True, 'data': {'tasks': [], 'total': 0}}
+        self.nas.queue('list', fake_response(body, headers={'ETag': '"v1"'}),
+                       {'success': False, 'error': {'code': 119}}, fake_response(body, headers={'ETag': '"v2"'}))
+        self.ds._cache_ttl = 0
+        self.ds.get_download_info()
+        self.ds.get_download_info()
+        self.assertNotIn('If-None-Match', self.nas.requests[-1].headers)
+
+    def test_search_returns_as_soon_as_it_has_finished(self):
+        clock = self.fake_clock()
+        results = {'finished': True, 'items': [{'title': 'x 720p'}]}
+        self.nas.queue('start', {'success': True, 'data': {'taskid': 's1'}})
+        self.nas.queue('list', {'success': True, 'data': results})
+        self.assertEqual(self.ds.search('x'), results)
+        self.assertEqual(clock.sleeps, [])
+        self.assertEqual(self.nas.methods(), ['login', 'start', 'list'])
+        self.assertEqual(self.nas.params()['taskid'], 's1')
+
+    def test_search_returns_partial_results_at_wait_time(self):
+        clock = self.fake_clock()
+        partial = {'finished': False, 'items': [{'title': 'x 720p'}]}
+        self.nas.queue('start', {'success': True, 'data': {'taskid': 's1'}})
+        self.nas.queue('list', {'success': True, 'data': {'finished': False, 'items': []}},
+                       {'success': True, 'data': partial})
+        self.assertEqual(self.ds.search('x', wait_time=3), partial)
+        self.assertEqual(clock.now, 3)
+
+    def test_search_returns_none_when_it_cannot_start(self):
+        self.nas.queue('start', {'success': False, 'error': {'code': 400}})
+        self.assertIsNone(self.ds.search('x'))
+        self.assertEqual(self.nas.methods(), ['login', 'start'])
+
+    def queue_statuses(self, *statuses):
+        self.nas.queue('getinfo', *({'success': True, 'data': {'tasks': [{'status': status}]}} for status in statuses))
+
+    def test_seeding_download_is_kept(self):
+        clock = self.fake_clock()
+        self.queue_statuses('finished', 'seeding')
+        self.assertTrue(self.ds.correct_finished_downloads('dbid_1'))
+        self.assertLessEqual(clock.sleeps[0], 0.2)
+        self.assertEqual(self.nas.methods(), ['login', 'resume', 'getinfo', 'getinfo'])
+
+    def test_downloading_again_removes_the_task(self):
+        self.fake_clock()
+        self.queue_statuses('downloading')
+        self.assertTrue(self.ds.correct_finished_downloads('dbid_1'))
+        self.assertEqual(self.nas.methods(), ['login', 'resume', 'getinfo', 'delete'])
+        self.assertEqual(self.nas.params()['id'], 'dbid_1')
+
+    def test_unchanged_status_times_out(self):
+        clock = self.fake_clock()
+        self.queue_statuses('finished')
+        self.assertIs(self.ds.correct_finished_downloads('dbid_1', max_wait=5), False)
+        self.assertEqual(clock.now, 5)
+        self.assertNotIn('delete', self.nas.methods())
+
+    def test_resumes_only_once_while_polling(self):
+        self.fake_clock()
+        self.queue_statuses('finished', 'finished', 'finished', 'seeding')
+        self.ds.correct_finished_downloads('dbid_1')
+        self.assertEqual(self.nas.methods().count('resume'), 1)
+        self.assertEqual(self.nas.methods().count('getinfo'), 4)